@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+"""
+Script to compare two runs stored in the warehouse and detect performance regression.
+For each endpoint, concurrency, and data size, every metric in COMPARED_METRICS is
+compared with a Welch t-test using one sample per iteration, with the Welch confidence
+interval of the relative change between the baseline and the candidate.
+A full run has many comparisons, so the p-values of each metric are adjusted with
+the Benjamini-Hochberg method to keep the false discovery rate of each metric
+below 1 - CONFIDENCE_LEVEL.
+The change is flagged when the adjusted p-value is below 1 - CONFIDENCE_LEVEL
+and the relative change is at least MIN_RELATIVE_CHANGE.
+The report is written as JSON, the exit code is 1 when any regression is found
+and 2 on usage error or unknown run.
+"""
+
+import json
+import sys
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from warehouse import load_metric, load_summary
+
+# Metric to compare and whether a higher value is better
+COMPARED_METRICS: Dict[str, bool] = {
+    "transaction_rate": True,
+    "response_time": False,
+    "memory_usage_percent": False,
+}
+
+CONFIDENCE_LEVEL = 0.95
+# run.sh run 5 iterations, fewer iterations cannot estimate the variance of a run
+MIN_SAMPLES = 5
+# Significant change smaller than this is still reported as no change
+MIN_RELATIVE_CHANGE = 0.05
+MULTIPLE_COMPARISON = "benjamini-hochberg per metric"
+
+
+def compare_samples(baseline: np.ndarray, candidate: np.ndarray) -> dict:
+    """compare the samples with a Welch t-test, the verdict is given after
+    every comparison is done, see add_verdicts
+
+    Args:
+        baseline (np.ndarray): one sample per iteration of the baseline
+        candidate (np.ndarray): one sample per iteration of the candidate
+
+    Returns:
+        dict: statistic of the comparison, without p_value when there is not enough data
+    """
+    baseline = baseline[~np.isnan(baseline)]
+    candidate = candidate[~np.isnan(candidate)]
+    result = {
+        "baseline_samples": len(baseline),
+        "candidate_samples": len(candidate),
+    }
+    if len(baseline) < MIN_SAMPLES or len(candidate) < MIN_SAMPLES:
+        return result
+
+    baseline_mean = baseline.mean()
+    candidate_mean = candidate.mean()
+    if baseline_mean == 0:
+        return result
+
+    baseline_variance = baseline.var(ddof=1) / len(baseline)
+    candidate_variance = candidate.var(ddof=1) / len(candidate)
+    standard_error = np.sqrt(baseline_variance + candidate_variance)
+    difference = candidate_mean - baseline_mean
+    if standard_error == 0:
+        # Both runs have no variance, the difference is exact
+        p_value = 1.0 if difference == 0 else 0.0
+        margin = 0.0
+    else:
+        # Welch-Satterthwaite degree of freedom, the same as the Welch t-test
+        degree_of_freedom = (baseline_variance + candidate_variance) ** 2 / (
+            baseline_variance**2 / (len(baseline) - 1)
+            + candidate_variance**2 / (len(candidate) - 1)
+        )
+        t_value = difference / standard_error
+        p_value = 2 * stats.t.sf(abs(t_value), degree_of_freedom)
+        t_critical = stats.t.ppf((1 + CONFIDENCE_LEVEL) / 2, degree_of_freedom)
+        margin = t_critical * standard_error
+
+    return {
+        **result,
+        "baseline_mean": round(float(baseline_mean), 4),
+        "candidate_mean": round(float(candidate_mean), 4),
+        "baseline_std": round(float(baseline.std(ddof=1)), 4),
+        "candidate_std": round(float(candidate.std(ddof=1)), 4),
+        "relative_change": round(float(difference / baseline_mean), 4),
+        # Confidence interval of the relative change, not adjusted
+        "ci_low": round(float((difference - margin) / baseline_mean), 4),
+        "ci_high": round(float((difference + margin) / baseline_mean), 4),
+        "p_value": float(p_value),
+    }
+
+
+def benjamini_hochberg_adjust(p_values: np.ndarray) -> np.ndarray:
+    """adjust the p-values with the Benjamini-Hochberg method
+    to control the false discovery rate
+
+    Args:
+        p_values (np.ndarray): p-value of every comparison
+
+    Returns:
+        np.ndarray: adjusted p-value in the same order
+    """
+    count = len(p_values)
+    order = np.argsort(p_values)
+    ranked = p_values[order] * count / np.arange(1, count + 1)
+    # The adjusted p-value is the minimum of every larger rank
+    adjusted_sorted = np.minimum(1.0, np.minimum.accumulate(ranked[::-1])[::-1])
+    adjusted = np.empty(count)
+    adjusted[order] = adjusted_sorted
+    return adjusted
+
+
+def add_verdicts(comparisons: List[dict]):
+    """adjust the p-value across the comparisons of each metric
+    and give the verdict, in place
+
+    Args:
+        comparisons (List[dict]): every comparison of the report
+    """
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        tested = [c for c in comparisons if c["metric"] == metric and "p_value" in c]
+        adjusted = benjamini_hochberg_adjust(np.array([c["p_value"] for c in tested]))
+        for comparison, adjusted_p_value in zip(tested, adjusted):
+            comparison["p_value"] = round(comparison["p_value"], 6)
+            comparison["adjusted_p_value"] = round(float(adjusted_p_value), 6)
+            significant = adjusted_p_value < 1 - CONFIDENCE_LEVEL
+            relative_change = comparison["relative_change"]
+            verdict = "no change"
+            if significant and abs(relative_change) >= MIN_RELATIVE_CHANGE:
+                improved = (relative_change > 0) == higher_is_better
+                verdict = "improvement" if improved else "regression"
+            comparison["verdict"] = verdict
+
+    for comparison in comparisons:
+        comparison.setdefault("verdict", "insufficient data")
+
+
+def add_memory_usage(df_result: pd.DataFrame, df_metric: pd.DataFrame) -> pd.DataFrame:
+    """attach the mean memory usage recorded during each iteration, the samples inside
+    one iteration are not independent so they are averaged to one sample per iteration
+
+    Args:
+        df_result (pd.DataFrame): siege result of one server
+        df_metric (pd.DataFrame): metric of the same server
+
+    Returns:
+        pd.DataFrame: one row per iteration with the endpoint, concurrent, and scale
+    """
+    columns = ["endpoint", "concurrent", "scale", "memory_usage_percent"]
+    if df_metric.empty or "memory_available" not in df_metric:
+        return pd.DataFrame(columns=columns)
+
+    memory_usage_percent = (
+        (df_metric["memory_total"] - df_metric["memory_available"])
+        / df_metric["memory_total"]
+        * 100
+    ).to_numpy()
+    epochs = df_metric["epoch"].to_numpy()
+    # The trimmed elapsed time start after the warmup, same as the transaction rate
+    warmups = df_result.get("warmup", pd.Series(0, index=df_result.index))
+    starts = (df_result["epoch"] + warmups).to_numpy()[:, None]
+    ends = starts + df_result["elapsed_time"].to_numpy()[:, None]
+    # Matrix of iteration x metric sample, true when the sample is inside the iteration
+    inside = (epochs >= starts) & (epochs <= ends)
+    sample_count = inside.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        iteration_memory = (inside * memory_usage_percent).sum(axis=1) / sample_count
+
+    df_memory = df_result[columns[:-1]].copy()
+    df_memory["memory_usage_percent"] = iteration_memory
+    return df_memory.loc[sample_count > 0]
+
+
+def compare_runs(baseline: str, candidate: str, warmup: int = 0) -> dict:
+    """compare every endpoint, concurrency, and data size that exist in both runs
+
+    Args:
+        baseline (str): server name of the baseline run
+        candidate (str): server name of the candidate run
+        warmup (int, optional): only compare result trimmed with this warmup. Defaults to 0.
+
+    Returns:
+        dict: the report
+    """
+    df_result = load_summary([baseline, candidate], warmup)
+    df_metric = load_metric([baseline, candidate])
+    for server in (baseline, candidate):
+        assert (
+            server in df_result["server"].values
+        ), f"{server} with warmup {warmup} not found in the warehouse"
+
+    samples: Dict[str, pd.DataFrame] = {}
+    for server in (baseline, candidate):
+        df_server = df_result.loc[df_result["server"] == server]
+        df_server_metric = (
+            df_metric.loc[df_metric["server"] == server]
+            if not df_metric.empty
+            else df_metric
+        )
+        samples[server] = pd.concat(
+            [df_server, add_memory_usage(df_server, df_server_metric)]
+        )
+
+    comparisons: List[dict] = []
+    group_columns = ["endpoint", "concurrent", "scale"]
+    groups = df_result.groupby(group_columns)["server"].nunique().reset_index()
+    groups = groups.loc[groups["server"] == 2]
+    for endpoint, concurrent, scale in groups[group_columns].values:
+        for metric in COMPARED_METRICS:
+            values = {}
+            for server in (baseline, candidate):
+                df_samples = samples[server]
+                values[server] = (
+                    df_samples.loc[
+                        (df_samples["endpoint"] == endpoint)
+                        & (df_samples["concurrent"] == concurrent)
+                        & (df_samples["scale"] == scale)
+                    ]
+                    .get(metric, pd.Series(dtype=float))
+                    .to_numpy(dtype=float)
+                )
+            comparison = compare_samples(values[baseline], values[candidate])
+            comparisons.append(
+                {
+                    "endpoint": endpoint,
+                    "concurrent": int(concurrent),
+                    "scale": float(scale),
+                    "metric": metric,
+                    **comparison,
+                }
+            )
+
+    add_verdicts(comparisons)
+    verdicts = [c["verdict"] for c in comparisons]
+    return {
+        "baseline": baseline,
+        "candidate": candidate,
+        "warmup": warmup,
+        "confidence_level": CONFIDENCE_LEVEL,
+        "min_relative_change": MIN_RELATIVE_CHANGE,
+        "multiple_comparison": MULTIPLE_COMPARISON,
+        "regressions": verdicts.count("regression"),
+        "improvements": verdicts.count("improvement"),
+        "comparisons": comparisons,
+    }
+
+
+def main():
+    args = sys.argv
+    if len(args) < 3:
+        print(
+            """Usage: python compare.py <baseline> <candidate> [output_file] [warmup]
+    <baseline> and <candidate> are server names stored in the warehouse
+    the report is written to output_file or stdout when it is "-"
+    exit code is 1 on regression, 2 on usage error or unknown run
+    <warmup> select the result summarized with the same warmup. Default 0
+    example: compare.py dafav2 dafav2_optimized report.json 5"""
+        )
+        sys.exit(2)
+
+    try:
+        warmup = 0
+        if len(args) > 4:
+            assert args[4].isdigit(), "Warmup must be a number of seconds"
+            warmup = int(args[4])
+
+        report = compare_runs(args[1], args[2], warmup)
+    except AssertionError as error:
+        # Exit code 1 is only for regression, so a typo does not look like a regression
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(2)
+    output = json.dumps(report, indent=2)
+    if len(args) > 3 and args[3] != "-":
+        with open(args[3], "w") as output_file:
+            output_file.write(output)
+            print(f"Output written to {output_file.name}")
+    else:
+        print(output)
+
+    for comparison in report["comparisons"]:
+        if comparison["verdict"] == "regression":
+            print(
+                f"Regression on {comparison['endpoint']} {comparison['concurrent']} "
+                f"{comparison['metric']}: {comparison['relative_change']:+.2%}",
+                file=sys.stderr,
+            )
+
+    if report["regressions"] > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
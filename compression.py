@@ -0,0 +1,46 @@
+"""Open plain or compressed text file as a stream based on the file extension"""
+
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_SUFFIXES = [".gz", ".zst", ".bz2", ".xz"]
+
+
+def open_text(file_name, mode: str = "r"):
+    """open a text file, the file is decompressed or compressed on the fly
+    when the name ends with one of COMPRESSED_SUFFIXES
+
+    Args:
+        file_name (str): path to the file
+        mode (str, optional): "r" to read or "w" to write. Defaults to "r".
+
+    Returns:
+        text stream of the file
+    """
+    suffix = Path(file_name).suffix
+    if suffix == ".gz":
+        return gzip.open(file_name, mode + "t")
+    elif suffix == ".bz2":
+        return bz2.open(file_name, mode + "t")
+    elif suffix == ".xz":
+        return lzma.open(file_name, mode + "t")
+    elif suffix == ".zst":
+        assert zstandard is not None, f"Install zstandard to open {file_name}"
+        return zstandard.open(file_name, mode + "t")
+
+    return open(file_name, mode)
+
+
+def strip_compression_suffix(file_name) -> str:
+    """remove the compression extension, result.txt.gz become result.txt"""
+    path = Path(file_name)
+    if path.suffix in COMPRESSED_SUFFIXES:
+        return str(path.with_suffix(""))
+    return str(path)
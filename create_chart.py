@@ -11,6 +11,7 @@ from scipy.interpolate import interp1d
 from slugify import slugify
 
 from get_metric import METRICS_TO_GET, get_metric_from_summary_file
+from warehouse import load_metric, load_summary, query
 
 THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
 PLOT_FOLDER = os.path.join(THIS_FOLDER, "plot")
@@ -82,6 +83,9 @@ LABEL = {
     "v3": V3_SERVER_LABEL,
 }
 
+# Version name used when the server is selected from the warehouse
+QUERY_VERSION = "query"
+
 
 def split_dataframe_per_version(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     """Create a dictionary of dataframe per version
@@ -92,14 +96,29 @@ def split_dataframe_per_version(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     Returns:
         Dict[str, pd.DataFrame]: _description_
     """
-    df_v1 = df[df["server"].isin(V1_SERVER)]
-    df_v2 = df[df["server"].isin(V2_SERVER)]
-    df_v3 = df[df["server"].isin(V3_SERVER)]
-    return {
-        "v1": df_v1,
-        "v2": df_v2,
-        "v3": df_v3,
-    }
+    return {version: df[df["server"].isin(SERVER[version])] for version in SERVER}
+
+
+def select_server_by_query(sql: str) -> List[str]:
+    """Replace the hard-coded server list with the server returned by a query
+    to the warehouse, the server name is used as the label
+
+    Args:
+        sql (str): query that return a server column
+
+    Returns:
+        List[str]: list of selected server
+    """
+    servers = query(sql)["server"].unique().tolist()
+    assert len(servers) > 0, f"No server found for {sql}"
+    logging.info(f"Selected server {servers}")
+
+    SERVER.clear()
+    SERVER[QUERY_VERSION] = servers
+    LABEL.clear()
+    LABEL[QUERY_VERSION] = {server: server for server in servers}
+    ENDPOINT_EXCLUDE_VERSION[QUERY_VERSION] = EXCLUDE_ENDPOINT_ALL
+    return servers
 
 
 def create_time_chart(df: pd.DataFrame, version: str):
@@ -212,13 +231,16 @@ def create_bar_chart(df: pd.DataFrame, version: str):
         plt.savefig(os.path.join(PLOT_FOLDER, filename), bbox_inches="tight")
 
 
-def create_chart_metric(input_file):
-    """Create chart for each metric in the input file and save it to the PLOT_FOLDER folder
+def create_chart_metric(df: pd.DataFrame):
+    """Create chart for each metric and save it to the PLOT_FOLDER folder
 
     Args:
-        input_file (_type_): xlsx file that contains the data to be plotted
+        df (pd.DataFrame): metric of each server generated by get_metric.py
     """
-    df = get_metric_from_summary_file(input_file)
+    if df.empty:
+        logging.info("No metric found")
+        return
+
     df["memory_usage"] = df["memory_total"] - df["memory_available"]
     df["memory_usage_percent"] = df["memory_usage"] / df["memory_total"] * 100
     df["memory_usage_mb"] = df["memory_usage"] / 1_000_000
@@ -276,7 +298,7 @@ def create_chart_per_endpoint(
 ):
     logging.info(f"Creating plot for {endpoint}")
     df_endpoint_separated = df_version.loc[df_version["endpoint"] == endpoint]
-    concurrents = df_endpoint_separated["concurrent"].unique()
+    concurrents = sorted(df_endpoint_separated["concurrent"].unique())
     data = {"concurrent": concurrents}
     for v1_server_name in SERVER[version]:
         df_v1_server = df_endpoint_separated.loc[
@@ -288,7 +310,8 @@ def create_chart_per_endpoint(
             .sort_values(by=["concurrent"])
         )
         label = LABEL[version][v1_server_name]
-        data[label] = df_v1_server[column_to_compare].tolist()
+        # Scenario is only run on some server, leave the missing concurrent empty
+        data[label] = df_v1_server[column_to_compare].reindex(concurrents).tolist()
 
     new_df = pd.DataFrame(data)
 
@@ -335,7 +358,9 @@ def create_chart_all_endpoint(
             .sort_values(by=["endpoint"])
         )
         label = LABEL[version][v1_server_name]
-        datas[label] = df_endpoint_grouped[column_to_compare].tolist()
+        datas[label] = (
+            df_endpoint_grouped[column_to_compare].reindex(endpoints).tolist()
+        )
 
     new_df = pd.DataFrame(datas)
     title = f"Komparasi Semua Endpoint"
@@ -401,10 +426,196 @@ def create_chart_combine_all_endpoint(
     plt.savefig(os.path.join(PLOT_FOLDER, filename), bbox_inches="tight")
 
 
-def create_chart_siege_result(input_file):
-    logging.info(f"Creating chart from {input_file}")
-    df = pd.read_excel(input_file, sheet_name="All")
+def add_missing_scale(df: pd.DataFrame):
+    if "scale" not in df:
+        # Summary generated before the data size sweep
+        df["scale"] = 1.0
+
+
+def create_chart_timeline(input_file):
+    """Create per second timeline chart for each endpoint and concurrency,
+    only for summary generated from result with timeline
+
+    Args:
+        input_file (_type_): xlsx file that contains the data to be plotted
+    """
+    if "Timeline" not in pd.ExcelFile(input_file).sheet_names:
+        logging.info(f"No timeline found in {input_file}")
+        return
+
+    df = pd.read_excel(input_file, sheet_name="Timeline")
+    add_missing_scale(df)
+    data_frames = split_dataframe_per_version(df)
+    for version in data_frames:
+        df_version = data_frames[version]
+        excluded_endpoint = ENDPOINT_EXCLUDE_VERSION[version]
+        df_version = df_version.loc[~df_version["endpoint"].isin(excluded_endpoint)]
+        multiple_scale = df_version["scale"].nunique() > 1
+        for (endpoint, concurrent, scale), df_endpoint in df_version.groupby(
+            ["endpoint", "concurrent", "scale"]
+        ):
+            title = f"{endpoint} {concurrent} timeline"
+            if multiple_scale:
+                title = f"{endpoint} {concurrent} scale {scale:g} timeline"
+            logging.info(f"Creating plot for {title}")
+            fig, (ax_rate, ax_latency) = plt.subplots(
+                2, 1, sharex=True, figsize=(10, 7)
+            )
+            for idx, server in enumerate(SERVER[version]):
+                df_server = df_endpoint.loc[df_endpoint["server"] == server]
+                if df_server.empty:
+                    continue
+                # Average every iteration on the same second
+                df_server = df_server.groupby("second").mean(numeric_only=True)
+                label = LABEL[version][server]
+                color = COLOR[idx % len(COLOR)]
+                ax_rate.plot(
+                    df_server.index, df_server["transactions"], label=label, color=color
+                )
+                ax_latency.plot(
+                    df_server.index, df_server["latency_p90"], label=label, color=color
+                )
+
+            ax_rate.set_ylabel("Transaksi per detik")
+            ax_latency.set_ylabel("Waktu respons p90 (detik)")
+            ax_latency.set_xlabel("Detik")
+            ax_rate.legend(
+                loc="upper center",
+                title=title,
+                bbox_to_anchor=(0.5, 1.35),
+                ncol=5,
+                fancybox=True,
+                shadow=True,
+            )
+
+            filename = slugify(f"{version}-{title}") + ".png"
+            logging.info(f"{version} Saving {title}")
+            plt.savefig(os.path.join(PLOT_FOLDER, filename), bbox_inches="tight")
+            plt.close(fig)
+
+
+def create_chart_breakdown(input_file):
+    """Create chart of the transaction rate per request type for each scenario,
+    only for summary generated from result with breakdown
+
+    Args:
+        input_file (_type_): xlsx file that contains the data to be plotted
+    """
+    if "Breakdown" not in pd.ExcelFile(input_file).sheet_names:
+        logging.info(f"No breakdown found in {input_file}")
+        return
+
+    df = pd.read_excel(input_file, sheet_name="Breakdown")
+    add_missing_scale(df)
+    data_frames = split_dataframe_per_version(df)
+    for version in data_frames:
+        df_version = data_frames[version]
+        # Plain endpoint only has one request type, only chart the scenario
+        df_version = df_version.loc[df_version["endpoint"].str.startswith("SCENARIO ")]
+        multiple_scale = df_version["scale"].nunique() > 1
+        for (endpoint, scale), df_endpoint in df_version.groupby(["endpoint", "scale"]):
+            plt.clf()
+            plt.cla()
+            requests = sorted(df_endpoint["request"].unique())
+            datas = {"request": requests}
+            y_label = []
+            for server in SERVER[version]:
+                df_server = df_endpoint.loc[df_endpoint["server"] == server]
+                if df_server.empty:
+                    continue
+                df_request_grouped = (
+                    df_server.groupby(["request"], dropna=False)
+                    .mean(numeric_only=True)
+                    .reindex(requests)
+                )
+                label = LABEL[version][server]
+                datas[label] = df_request_grouped["transaction_rate"].tolist()
+                y_label.append(label)
+
+            new_df = pd.DataFrame(datas)
+            title = f"{endpoint} breakdown"
+            if multiple_scale:
+                title = f"{endpoint} scale {scale:g} breakdown"
+            logging.info(f"Creating plot for {title}")
+            ax = new_df.plot(
+                kind="bar",
+                x="request",
+                y=y_label,
+                ylabel="Transaksi per detik",
+                xlabel="Request",
+                rot=0,
+                width=0.85,
+                figsize=(10, 5),
+                color=COLOR,
+            )
+            bars = ax.patches
+            hatches = [h for h in HATCH for j in range(len(new_df))]
+
+            excel_filename = slugify(f"{version}-{title}") + ".xlsx"
+            new_df.to_excel(os.path.join(PLOT_FOLDER, excel_filename))
+
+            for bar, hatch in zip(bars, hatches):
+                bar.set_hatch(hatch)
+
+            modify_ax(ax, title)
+
+            logging.info(f"{version} Saving {title}")
+            filename = slugify(f"{version}-{title}") + ".png"
+            plt.savefig(os.path.join(PLOT_FOLDER, filename), bbox_inches="tight")
+
+
+def create_chart_per_scale(
+    endpoint: str, df_version: pd.DataFrame, version: str, column_to_compare: str
+):
+    logging.info(f"Creating scale plot for {endpoint}")
+    df_endpoint_separated = df_version.loc[df_version["endpoint"] == endpoint]
+    scales = sorted(df_endpoint_separated["scale"].unique())
+    data = {"scale": scales}
+    y_label = []
+    for server_name in SERVER[version]:
+        df_server = df_endpoint_separated.loc[
+            df_endpoint_separated["server"] == server_name
+        ]
+        if df_server.empty:
+            continue
+        df_server = df_server.groupby(["scale"], dropna=False).mean(numeric_only=True)
+        label = LABEL[version][server_name]
+        data[label] = df_server[column_to_compare].reindex(scales).tolist()
+        y_label.append(label)
+
+    new_df = pd.DataFrame(data)
+
+    title = f"{endpoint} scale"
+    ax = new_df.plot(
+        kind="bar",
+        x="scale",
+        y=y_label,
+        ylabel="Transaksi per detik",
+        xlabel="Skala data",
+        rot=0,
+        width=0.85,
+        figsize=(10, 5),
+        color=COLOR,
+    )
+    bars = ax.patches
+    hatches = [h for h in HATCH for j in range(len(new_df))]
+
+    excel_filename = slugify(f"{version}-{title}") + ".xlsx"
+    new_df.to_excel(os.path.join(PLOT_FOLDER, excel_filename))
+
+    for bar, hatch in zip(bars, hatches):
+        bar.set_hatch(hatch)
+
+    modify_ax(ax, title)
+
+    logging.info(f"{version} Saving {title}")
+    filename = slugify(f"{version}-{title}") + ".png"
+    plt.savefig(os.path.join(PLOT_FOLDER, filename), bbox_inches="tight")
+
+
+def create_chart_siege_result(df: pd.DataFrame):
     # df = df.loc[~df["endpoint"].isin(EXCLUDE_ENDPOINT_ALL)]
+    add_missing_scale(df)
 
     data_frames = split_dataframe_per_version(df)
     column_to_compare = "transaction_rate"
@@ -414,6 +625,11 @@ def create_chart_siege_result(input_file):
         excluded_endpoint = ENDPOINT_EXCLUDE_VERSION[version]
         df_version = df_version.loc[~df_version["endpoint"].isin(excluded_endpoint)]
         endpoints = df_version["endpoint"].unique()
+        if df_version["scale"].nunique() > 1:
+            for endpoint in endpoints:
+                create_chart_per_scale(endpoint, df_version, version, column_to_compare)
+        # Only compare the concurrency on the smallest data size
+        df_version = df_version.loc[df_version["scale"] == df_version["scale"].min()]
         for endpoint in endpoints:
             create_chart_per_endpoint(endpoint, df_version, version, column_to_compare)
         create_chart_all_endpoint(df_version, column_to_compare, version)
@@ -424,14 +640,27 @@ def main():
     args = sys.argv
     if len(args) < 2:
         print(
-            """Usage: python create_chart.py filename
+            """Usage: python create_chart.py [filename|warehouse <sql>]
 filname is an xlsx file generated from get_summary.py script
-example: create_chart.py summary/all.xlsx"""
+or select the server from the warehouse with a query that return a server column
+example: create_chart.py warehouse "SELECT DISTINCT server FROM siege_result WHERE version = 'v2'"
+or create_chart.py summary/all.xlsx"""
         )
         sys.exit(1)
 
-    create_chart_siege_result(args[1])
-    create_chart_metric(args[1])
+    if args[1] == "warehouse":
+        assert len(args) > 2, "Missing sql query"
+        servers = select_server_by_query(args[2])
+        logging.info("Creating chart from warehouse")
+        create_chart_siege_result(load_summary(servers))
+        create_chart_metric(load_metric(servers))
+        return
+
+    logging.info(f"Creating chart from {args[1]}")
+    create_chart_siege_result(pd.read_excel(args[1], sheet_name="All"))
+    create_chart_timeline(args[1])
+    create_chart_breakdown(args[1])
+    create_chart_metric(get_metric_from_summary_file(args[1]))
 
 
 if __name__ == "__main__":
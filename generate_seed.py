@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""
+Script to generate a scaled seed data from version1.sql or version2.sql.
+The original rows are kept so the user, node, and hardware used by run.sh still exist,
+generated rows are appended to each COPY block until the table has
+<scale> times the original number of rows. user_person is never scaled.
+The output is written to stdout so it can be piped to psql and bulk loaded with COPY.
+"""
+
+import os
+import random
+import re
+import string
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List
+
+THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+VERSIONS = ["version1", "version2"]
+NOT_SCALED_TABLES = ["user_person"]
+
+COPY_PATTERN = re.compile(r"^COPY public\.(\w+) \((.*)\) FROM stdin;$")
+SETVAL_PATTERN = re.compile(
+    r"^SELECT pg_catalog\.setval\('public\.(\w+)', \d+, true\);$"
+)
+END_OF_COPY = "\\."
+
+# Generated time series start from this time, one row every TIME_STEP seconds
+START_EPOCH = 1640995200  # 2022-01-01 00:00:00 UTC
+TIME_STEP = 1.5
+SENSOR_TYPE = "sensor"
+FIELD_PER_NODE = 10
+
+COLUMNS = {
+    "version1": {
+        "channel": ['"time"', "value", "id_sensor"],
+        "hardware": ["id_hardware", "name", "type", "description"],
+        "node": ["id_node", "name", "location", "id_hardware", "id_user"],
+        "sensor": ["id_sensor", "name", "unit", "id_hardware", "id_node"],
+    },
+    "version2": {
+        "feed": ['"time"', "value", "id_node"],
+        "hardware": ["id_hardware", "name", "type", "description"],
+        "node": [
+            "id_node",
+            "id_user",
+            "id_hardware_node",
+            "name",
+            "location",
+            "id_hardware_sensor",
+            "field_sensor",
+            "is_public",
+        ],
+    },
+}
+
+
+class IdPool:
+    """Original id of a table and the id range that will be generated"""
+
+    def __init__(self):
+        self.original: List[int] = []
+        self.generated = range(0)
+
+    def choice(self, rng: random.Random) -> int:
+        index = rng.randrange(len(self.original) + len(self.generated))
+        if index < len(self.original):
+            return self.original[index]
+        return self.generated[index - len(self.original)]
+
+    def max(self) -> int:
+        if len(self.generated) > 0:
+            return self.generated[-1]
+        return max(self.original, default=0)
+
+
+class Seed:
+    """State shared between table generator"""
+
+    def __init__(self, version: str, scale: float, rng: random.Random):
+        self.version = version
+        self.scale = scale
+        self.rng = rng
+        self.row_count: Dict[str, int] = {}
+        self.ids: Dict[str, IdPool] = {}
+        # Hardware id grouped by sensor and non sensor type
+        self.node_hardware = IdPool()
+        self.sensor_hardware = IdPool()
+        self.hardware_types: List[str] = []
+
+    def generated_count(self, table: str) -> int:
+        if table in NOT_SCALED_TABLES:
+            return 0
+        original = self.row_count.get(table, 0)
+        return max(0, round(original * self.scale) - original)
+
+    def hardware_type(self, id_hardware: int) -> str:
+        # Keep the same type distribution as the original rows
+        return self.hardware_types[id_hardware % len(self.hardware_types)]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def format_time(index: int) -> str:
+    time = datetime.fromtimestamp(START_EPOCH + index * TIME_STEP, timezone.utc)
+    return time.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def generate_hardware(seed: Seed, ids: range) -> Iterator[str]:
+    rng = seed.rng
+    for id_hardware in ids:
+        hardware_type = seed.hardware_type(id_hardware)
+        name = random_text(rng, 10)
+        description = random_text(rng, 20)
+        yield f"{id_hardware}\t{name}\t{hardware_type}\t{description}"
+
+
+def generate_node_v1(seed: Seed, ids: range) -> Iterator[str]:
+    rng = seed.rng
+    for id_node in ids:
+        id_hardware = seed.node_hardware.choice(rng)
+        id_user = seed.ids["user_person"].choice(rng)
+        name = random_text(rng, 10)
+        location = random_text(rng, 7)
+        yield f"{id_node}\t{name}\t{location}\t{id_hardware}\t{id_user}"
+
+
+def generate_sensor(seed: Seed, ids: range) -> Iterator[str]:
+    rng = seed.rng
+    for id_sensor in ids:
+        id_hardware = seed.sensor_hardware.choice(rng)
+        id_node = seed.ids["node"].choice(rng)
+        name = random_text(rng, 10)
+        unit = random_text(rng, 7)
+        yield f"{id_sensor}\t{name}\t{unit}\t{id_hardware}\t{id_node}"
+
+
+def generate_channel(seed: Seed, count: int) -> Iterator[str]:
+    rng = seed.rng
+    for index in range(count):
+        id_sensor = seed.ids["sensor"].choice(rng)
+        yield f"{format_time(index)}\t{rng.random()}\t{id_sensor}"
+
+
+def generate_node_v2(seed: Seed, ids: range) -> Iterator[str]:
+    rng = seed.rng
+    for id_node in ids:
+        id_user = seed.ids["user_person"].choice(rng)
+        id_hardware_node = seed.node_hardware.choice(rng)
+        id_hardware_sensor = ",".join(
+            str(seed.sensor_hardware.choice(rng)) for _ in range(FIELD_PER_NODE)
+        )
+        field_sensor = ",".join(
+            f'"{random_text(rng, 10)}"' for _ in range(FIELD_PER_NODE)
+        )
+        name = random_text(rng, 10)
+        location = round(rng.uniform(-180, 180), 7)
+        is_public = rng.choice("tf")
+        yield (
+            f"{id_node}\t{id_user}\t{id_hardware_node}\t{name}\t{location}\t"
+            f"{{{id_hardware_sensor}}}\t{{{field_sensor}}}\t{is_public}"
+        )
+
+
+def generate_feed(seed: Seed, count: int) -> Iterator[str]:
+    rng = seed.rng
+    for index in range(count):
+        value = ",".join(f"{rng.uniform(0, 1000):.2f}" for _ in range(FIELD_PER_NODE))
+        id_node = seed.ids["node"].choice(rng)
+        yield f"{format_time(index)}\t{{{value}}}\t{id_node}"
+
+
+# Table with id take the id range to generate, time series table take the row count
+ID_GENERATORS: Dict[str, Dict[str, Callable[[Seed, range], Iterator[str]]]] = {
+    "version1": {
+        "hardware": generate_hardware,
+        "node": generate_node_v1,
+        "sensor": generate_sensor,
+    },
+    "version2": {
+        "hardware": generate_hardware,
+        "node": generate_node_v2,
+    },
+}
+TIME_SERIES_GENERATORS: Dict[str, Dict[str, Callable[[Seed, int], Iterator[str]]]] = {
+    "version1": {"channel": generate_channel},
+    "version2": {"feed": generate_feed},
+}
+
+
+def read_original_rows(seed: Seed, sql_lines: List[str]):
+    """count the original rows and collect the original id of each table"""
+    table = None
+    for line in sql_lines:
+        if table is None:
+            match = COPY_PATTERN.match(line)
+            if match is not None:
+                table = match.group(1)
+                columns = match.group(2).split(", ")
+                if table in COLUMNS[seed.version]:
+                    assert (
+                        columns == COLUMNS[seed.version][table]
+                    ), f"Column of {table} is different from the expected column"
+                seed.row_count[table] = 0
+                if table in ID_GENERATORS[seed.version] or table in NOT_SCALED_TABLES:
+                    seed.ids[table] = IdPool()
+            continue
+
+        if line == END_OF_COPY:
+            table = None
+            continue
+
+        seed.row_count[table] += 1
+        values = line.split("\t")
+        if table in seed.ids:
+            seed.ids[table].original.append(int(values[0]))
+        if table == "hardware":
+            seed.hardware_types.append(values[2])
+            if values[2] == SENSOR_TYPE:
+                seed.sensor_hardware.original.append(int(values[0]))
+            else:
+                seed.node_hardware.original.append(int(values[0]))
+
+    # Generated id continue from the original max id
+    for table, pool in seed.ids.items():
+        start = pool.max() + 1
+        pool.generated = range(start, start + seed.generated_count(table))
+
+    for id_hardware in seed.ids["hardware"].generated:
+        if seed.hardware_type(id_hardware) == SENSOR_TYPE:
+            seed.sensor_hardware.original.append(id_hardware)
+        else:
+            seed.node_hardware.original.append(id_hardware)
+
+
+def generate_seed(version: str, scale: float, output_stream, random_seed: int = 0):
+    """write the scaled version of the sql dump to output_stream
+
+    Args:
+        version (str): version1 or version2
+        scale (float): number of rows compared to the original dump, must be >= 1
+        output_stream: where to write the sql
+        random_seed (int, optional): seed for the random generator. Defaults to 0.
+    """
+    with open(os.path.join(THIS_FOLDER, f"{version}.sql"), "r") as sql_file:
+        sql_lines = sql_file.read().splitlines()
+
+    seed = Seed(version, scale, random.Random(random_seed))
+    read_original_rows(seed, sql_lines)
+    # Sequence name is <table>_<id column>_seq
+    sequences = {
+        f"{table}_{COLUMNS[version][table][0]}_seq": table
+        for table in ID_GENERATORS[version]
+    }
+
+    table = None
+    for line in sql_lines:
+        if table is None:
+            match = COPY_PATTERN.match(line)
+            if match is not None:
+                table = match.group(1)
+            setval_match = SETVAL_PATTERN.match(line)
+            if setval_match is not None and setval_match.group(1) in sequences:
+                max_id = seed.ids[sequences[setval_match.group(1)]].max()
+                line = re.sub(r", \d+, true\);$", f", {max_id}, true);", line)
+            output_stream.write(line + "\n")
+            continue
+
+        if line == END_OF_COPY:
+            if table in ID_GENERATORS[version]:
+                rows = ID_GENERATORS[version][table](seed, seed.ids[table].generated)
+            elif table in TIME_SERIES_GENERATORS[version]:
+                rows = TIME_SERIES_GENERATORS[version][table](
+                    seed, seed.generated_count(table)
+                )
+            else:
+                rows = iter([])
+            for row in rows:
+                output_stream.write(row + "\n")
+            table = None
+
+        output_stream.write(line + "\n")
+
+
+def main():
+    args = sys.argv
+    if len(args) < 3:
+        print(
+            """Usage: python generate_seed.py <version1|version2> <scale> [random_seed]
+    <scale> is the number of rows compared to the original dump, must be >= 1
+    the sql is written to stdout
+    example: generate_seed.py version2 100 | psql -h localhost -U postgres postgres"""
+        )
+        sys.exit(1)
+
+    assert args[1] in VERSIONS, f"Version must be one of {VERSIONS}"
+    scale = float(args[2])
+    assert scale >= 1, "Scale must be greater than or equal to 1"
+    random_seed = int(args[3]) if len(args) > 3 else 0
+
+    generate_seed(args[1], scale, sys.stdout, random_seed)
+
+
+if __name__ == "__main__":
+    main()
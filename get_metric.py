@@ -3,22 +3,42 @@
 """
 Script to get metrics from Digital Ocean API.
 The output is a JSON file in the metric folder with the following format:
-<output_name>_<metric_name>_<start>_<end>.json
+<output_name>_<metric_name>_<start>_<end>.json.gz
+Cached file compressed with gzip, zstd, bz2, xz, or not compressed at all is read as is.
+
+If recordings/<output_name>.ring generated by record_metric.py exists,
+the metric is read from the recording instead of the Digital Ocean API.
 """
 
 from datetime import datetime
 import json
+import struct
 from typing import Dict, List, Optional
 import requests
 import sys
 import os
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
+from compression import COMPRESSED_SUFFIXES, open_text
+from record_metric import (
+    HEADER_FORMAT,
+    HEADER_MAGIC,
+    HEADER_SIZE,
+    RECORD_FIELDS,
+    RECORD_FORMAT,
+    RECORD_SIZE,
+    RECORDING_FOLDER,
+)
+from warehouse import store_metric
+
 load_dotenv()
 
 THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FOLDER = os.path.join(THIS_FOLDER, "metrics")
+# New cache is written compressed, metric json is highly compressible
+CACHE_SUFFIX = ".gz"
 DIGITAL_OCEAN_BASE_URL_API = (
     "https://api.digitalocean.com/v2/monitoring/metrics/droplet"
 )
@@ -58,6 +78,14 @@ def get_server_host_id(server_name):
     return None
 
 
+def get_recording_file(server_name) -> Optional[str]:
+    recording_file = os.path.join(RECORDING_FOLDER, f"{server_name}.ring")
+    if os.path.exists(recording_file):
+        return recording_file
+
+    return None
+
+
 def get_metric_from_summary_file(summary_file_name):
     """read the summary file and get the metric for each server
 
@@ -73,6 +101,18 @@ def get_metric_from_summary_file(summary_file_name):
     for server_name in server_names:
         df_server = df.loc[df["server"] == server_name]
         start, end = get_start_and_end_from_server_data(df_server)
+        recording_file = get_recording_file(server_name)
+        if recording_file is not None:
+            # epoch is the start of the iteration, include the whole last iteration
+            last_iteration = df_server.sort_values(by=["epoch"]).iloc[-1]
+            server_metric_data[server_name] = {
+                "recording_file": recording_file,
+                "start": start,
+                "end": float(last_iteration["epoch"])
+                + float(last_iteration["elapsed_time"]),
+            }
+            continue
+
         host_id = get_server_host_id(server_name)
 
         if host_id is None:
@@ -88,7 +128,15 @@ def get_metric_from_summary_file(summary_file_name):
 
     metric_dataframes: List[pd.DataFrame] = []
     for server_name, server_metric in server_metric_data.items():
-        if server_metric is not None:
+        if server_metric is not None and "recording_file" in server_metric:
+            metric_df = get_metric_from_recording(
+                server_metric["recording_file"],
+                server_metric["start"],
+                server_metric["end"],
+                server_name,
+            )
+            metric_dataframes.append(metric_df)
+        elif server_metric is not None:
             metric_df = get_metric(
                 server_metric["host_id"],
                 server_metric["start"],
@@ -102,6 +150,21 @@ def get_metric_from_summary_file(summary_file_name):
     return pd.concat(metric_dataframes)
 
 
+def find_cached_file(output_filename: str) -> Optional[str]:
+    """find the cached response, either compressed or plain json
+
+    Args:
+        output_filename (str): path to the plain json file
+
+    Returns:
+        Optional[str]: path to the cached file, None when it is not cached yet
+    """
+    for suffix in [*COMPRESSED_SUFFIXES, ""]:
+        if os.path.exists(output_filename + suffix):
+            return output_filename + suffix
+    return None
+
+
 def get_metric(host_id, start, end, output_name):
     all_metric_data = {}
 
@@ -109,18 +172,20 @@ def get_metric(host_id, start, end, output_name):
         output_filename = os.path.join(
             OUTPUT_FOLDER, f"{output_name}_{metric}_{start}_{end}.json"
         )
+        cached_filename = find_cached_file(output_filename)
 
-        if os.path.exists(output_filename):
-            print(f"Using cached file {output_filename}")
-            json_response = json.load(open(output_filename))
+        if cached_filename is not None:
+            print(f"Using cached file {cached_filename}")
+            with open_text(cached_filename) as cached_file:
+                json_response = json.load(cached_file)
         else:
             url = f"{DIGITAL_OCEAN_BASE_URL_API}/{metric}"
             params = {"host_id": host_id, "start": start, "end": end}
             header = {"Authorization": f"Bearer {DIGITAL_OCEAN_API_KEY}"}
             response = requests.get(url, params=params, headers=header)
             json_response = response.json()
-            with open(output_filename, "w") as output_file:
-                output_file.write(json.dumps(json_response, indent=2))
+            with open_text(output_filename + CACHE_SUFFIX, "w") as output_file:
+                json.dump(json_response, output_file, separators=(",", ":"))
                 print(f"Output written to {output_file.name}")
 
         result = json_response["data"]["result"]
@@ -153,6 +218,77 @@ def get_metric(host_id, start, end, output_name):
         )
 
     df = pd.DataFrame(all_metric_data_matrix)
+    store_metric(df)
+    return df
+
+
+def read_recording(recording_file) -> np.ndarray:
+    """read all record from the ring buffer file written by record_metric.py
+
+    Args:
+        recording_file (str): path to the ring buffer file
+
+    Returns:
+        np.ndarray: structured array of the record ordered from the oldest
+    """
+    numpy_type = {"d": "<f8", "Q": "<u8", "f": "<f4"}
+    dtype = np.dtype(
+        [
+            (field, numpy_type[fmt])
+            for field, fmt in zip(RECORD_FIELDS, RECORD_FORMAT.lstrip("<"))
+        ]
+    )
+    assert dtype.itemsize == RECORD_SIZE, "Record format mismatch"
+
+    with open(recording_file, "rb") as input_file:
+        magic, record_size, capacity, count = struct.unpack(
+            HEADER_FORMAT, input_file.read(HEADER_SIZE)
+        )
+        assert (
+            magic == HEADER_MAGIC and record_size == RECORD_SIZE
+        ), f"{recording_file} is not a recording file or has a different format"
+        records = np.fromfile(input_file, dtype=dtype, count=min(count, capacity))
+
+    if count > capacity:
+        # The buffer has wrapped, the oldest record is right after the newest one
+        records = np.roll(records, -(count % capacity))
+
+    return records
+
+
+def get_metric_from_recording(recording_file, start, end, output_name):
+    """get the metric between start and end from the ring buffer file,
+    the result has the same format as get_metric
+
+    Args:
+        recording_file (str): path to the ring buffer file
+        start (int): start epoch timestamp
+        end (int): end epoch timestamp
+        output_name (str): server name
+
+    Returns:
+        pd.DataFrame: dataframe with the metric of the server
+    """
+    print(f"Using recording file {recording_file}")
+    records = read_recording(recording_file)
+    records = records[
+        (records["epoch"] >= float(start)) & (records["epoch"] <= float(end))
+    ]
+
+    df = pd.DataFrame(records)
+    # rss is written as 0 when it is not recorded, a running process never has 0 rss
+    df["process_rss"] = df["process_rss"].replace(0, np.nan)
+    if df["process_rss"].isna().all():
+        df = df.drop(columns=["process_rss"])
+    df.insert(0, "server", output_name)
+    df.insert(
+        2,
+        "time",
+        df["epoch"].map(
+            lambda time: datetime.fromtimestamp(time).strftime("%Y-%m-%d %H:%M:%S %Z")
+        ),
+    )
+    store_metric(df)
     return df
 
 
@@ -160,17 +296,22 @@ def main():
     args = sys.argv
     if len(args) < 5:
         print(
-            """Usage: python get_metric.py <droplet_id> <start> <end> <output_name>
+            """Usage: python get_metric.py [<droplet_id>|<recording_file>] <start> <end> <output_name>
     <start> and <end> must be in epoch timestamp
-    example: get_metric.py 343280614 1678134676 1678166510 dafav1"""
+    <recording_file> is a ring buffer file generated by record_metric.py
+    example: get_metric.py 343280614 1678134676 1678166510 dafav1
+    or get_metric.py recordings/dafav1.ring 1678134676 1678166510 dafav1"""
         )
         sys.exit(1)
 
-    assert args[1].isdigit(), "Droplet ID must be a number"
     assert args[2].isdigit(), "Start must be in epoch timestamp"
     assert args[3].isdigit(), "End must be in epoch timestamp"
 
-    df = get_metric(args[1], args[2], args[3], args[4])
+    if os.path.isfile(args[1]):
+        df = get_metric_from_recording(args[1], args[2], args[3], args[4])
+    else:
+        assert args[1].isdigit(), "Droplet ID must be a number"
+        df = get_metric(args[1], args[2], args[3], args[4])
     df.to_csv(f"{OUTPUT_FOLDER}/{args[4]}.csv", index=False)
 
 
@@ -5,7 +5,7 @@ import json
 
 # import logging
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import pytz
 import re
 from datetime import datetime
@@ -13,6 +13,15 @@ import os
 import pandas as pd
 import sys
 
+from compression import open_text, strip_compression_suffix
+from timeline import (
+    BREAKDOWN_COLUMNS,
+    BREAKDOWN_PREFIX,
+    TIMELINE_COLUMNS,
+    TIMELINE_PREFIX,
+)
+from warehouse import store_summary
+
 THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FOLDER = os.path.join(THIS_FOLDER, "summary")
 RESULT_FOLDER = os.path.join(THIS_FOLDER, "result")
@@ -45,17 +54,68 @@ def convert_data_frames_to_excel(
             worksheet.set_column(idx, idx, max_len)  # set column widt
 
 
-def get_summary(input_file_name):
-    input_file = open(input_file_name, "r")
-    filename_without_ext = Path(input_file_name).with_suffix("").name
+def trim_warmup(data: Dict, timeline: List[Dict], warmup: int) -> bool:
+    """recompute the siege aggregate without the first warmup seconds,
+    using the same definition as siege
+
+    Args:
+        data (Dict): siege data of one iteration, modified in place
+        timeline (List[Dict]): per second timeline of the iteration
+        warmup (int): number of seconds to exclude
+
+    Returns:
+        bool: whether the iteration is trimmed
+    """
+    trimmed = [t for t in timeline if t["second"] >= warmup]
+    transactions = sum(t["transactions"] for t in trimmed)
+    http_errors = sum(t["http_errors"] for t in trimmed)
+    failed = sum(t["failed"] for t in trimmed)
+    elapsed_time = data["elapsed_time"] - warmup
+    if transactions == 0 or elapsed_time <= 0:
+        return False
+
+    total_response_time = sum(t["response_time"] * t["transactions"] for t in trimmed)
+    # siege MB is 1024 * 1024 bytes
+    data_transferred = sum(t["bytes"] for t in trimmed) / (1024 * 1024)
+    with_response = [t for t in trimmed if t["transactions"] > 0]
+
+    data["transactions"] = transactions
+    data["successful_transactions"] = transactions - http_errors
+    data["failed_transactions"] = failed
+    data["availability"] = round(transactions / (transactions + failed) * 100, 2)
+    data["elapsed_time"] = round(elapsed_time, 2)
+    data["data_transferred"] = round(data_transferred, 2)
+    data["response_time"] = round(total_response_time / transactions, 2)
+    data["transaction_rate"] = round(transactions / elapsed_time, 2)
+    data["throughput"] = round(data_transferred / elapsed_time, 2)
+    data["concurrency"] = round(total_response_time / elapsed_time, 2)
+    data["longest_transaction"] = max(t["longest_transaction"] for t in with_response)
+    data["shortest_transaction"] = min(t["shortest_transaction"] for t in with_response)
+    return True
+
+
+def get_summary(
+    input_file_name, warmup: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    input_file = open_text(input_file_name, "r")
+    filename_without_ext = (
+        Path(strip_compression_suffix(input_file_name)).with_suffix("").name
+    )
     print(f"Processing {filename_without_ext}")
-    content = input_file.readlines()
     output_data = []
-
-    for idx, line in enumerate(content):
+    timeline_data = []
+    breakdown_data = []
+    # Data size of the iteration, set by the "Scale: <scale>" line from run.sh
+    scale = 1.0
+    # Timeline of each iteration, keyed by the index in output_data
+    timelines: Dict[int, List[Dict]] = {}
+
+    # Read the file as a stream, so compressed file is never fully loaded
+    previous_line = ""
+    for line in input_file:
         line = line.strip()
         if line.startswith("[") and line.endswith("]"):
-            timestamp = content[idx - 1]
+            timestamp = previous_line
             # find the timestamp in the format (1626120000)
             epoch_timestamp: str = re.findall(r"\(.*?\)", timestamp)[0].strip("()")
             assert (
@@ -74,20 +134,17 @@ def get_summary(input_file_name):
             iteration = int(information_inside_bracket[1].strip("[]"))
 
             # Get the json value from siege
-            ## Find line starts with bracket
-            start_index = -1
-            for j, l in enumerate(content[idx:], idx):
+            ## Read from the line starts with bracket until the closing bracket
+            json_value = []
+            for l in input_file:
                 l = l.strip()
-                if l.startswith("{"):
-                    start_index = j
+                if l.startswith("{") or len(json_value) > 0:
+                    json_value.append(l.replace("\t", "").replace(" ", ""))
+                if l.startswith("}"):
                     break
-
-            json_value = content[start_index : start_index + 13]
-            json_value = list(
-                map(lambda x: x.strip().replace("\t", "").replace(" ", ""), json_value)
-            )
             json_value = "".join(json_value)
             siege_data = json.loads(json_value)
+            line = json_value
             data = {
                 "server": filename_without_ext,
                 "time": time.strftime("%Y-%m-%d %H:%M:%S %Z"),
@@ -95,21 +152,91 @@ def get_summary(input_file_name):
                 "endpoint": f"{method} {path}",
                 "concurrent": concurrency,
                 "iteration": iteration,
+                "scale": scale,
                 **siege_data,
             }
             output_data.append(data)
-        elif line.startswith("Sleeping"):
-            continue
+        elif line.startswith("Scale:"):
+            scale = float(line.split(":")[1])
+        elif line.startswith(TIMELINE_PREFIX):
+            values = line[len(TIMELINE_PREFIX) :].split(",")
+            row = dict(zip(TIMELINE_COLUMNS, map(float, values)))
+            for column in ["second", "transactions", "http_errors", "failed", "bytes"]:
+                row[column] = int(row[column])
+            timelines.setdefault(len(output_data) - 1, []).append(row)
+            timeline_data.append(
+                {
+                    "server": output_data[-1]["server"],
+                    "endpoint": output_data[-1]["endpoint"],
+                    "concurrent": output_data[-1]["concurrent"],
+                    "iteration": output_data[-1]["iteration"],
+                    "scale": output_data[-1]["scale"],
+                    **row,
+                }
+            )
+        elif line.startswith(BREAKDOWN_PREFIX):
+            # Request type may contain comma, only split the number from the right
+            values = line[len(BREAKDOWN_PREFIX) :].rsplit(
+                ",", len(BREAKDOWN_COLUMNS) - 1
+            )
+            row = dict(zip(BREAKDOWN_COLUMNS, [values[0], *map(float, values[1:])]))
+            # The breakdown is not trimmed, use the whole iteration elapsed time
+            row["transaction_rate"] = round(
+                row["transactions"] / output_data[-1]["elapsed_time"], 2
+            )
+            breakdown_data.append(
+                {
+                    "server": output_data[-1]["server"],
+                    "endpoint": output_data[-1]["endpoint"],
+                    "concurrent": output_data[-1]["concurrent"],
+                    "iteration": output_data[-1]["iteration"],
+                    "scale": output_data[-1]["scale"],
+                    **row,
+                }
+            )
+
+        previous_line = line
+
+    # Only the trimmed iteration is marked with the warmup
+    for data in output_data:
+        data["warmup"] = 0
+    if warmup > 0:
+        for index, timeline in timelines.items():
+            if trim_warmup(output_data[index], timeline, warmup):
+                output_data[index]["warmup"] = warmup
 
     print(f"Constructing dataframe from {filename_without_ext}")
 
     df = pd.DataFrame(output_data)
+    df_timeline = pd.DataFrame(
+        timeline_data,
+        columns=[
+            "server",
+            "endpoint",
+            "concurrent",
+            "iteration",
+            "scale",
+            *TIMELINE_COLUMNS,
+        ],
+    )
+    df_breakdown = pd.DataFrame(
+        breakdown_data,
+        columns=[
+            "server",
+            "endpoint",
+            "concurrent",
+            "iteration",
+            "scale",
+            *BREAKDOWN_COLUMNS,
+            "transaction_rate",
+        ],
+    )
     df_group_by_concurrent = df.groupby(
-        ["server", "endpoint", "concurrent"], dropna=False
+        ["server", "endpoint", "concurrent", "scale"], dropna=False
+    ).mean(numeric_only=True)
+    df_group_by_endpoint = df.groupby(
+        ["server", "endpoint", "scale"], dropna=False
     ).mean(numeric_only=True)
-    df_group_by_endpoint = df.groupby(["server", "endpoint"], dropna=False).mean(
-        numeric_only=True
-    )
     df_group_by_server = df.groupby(["server"], dropna=False).mean(numeric_only=True)
 
     output_filename = f"{OUTPUT_FOLDER}/summary_{filename_without_ext}.xlsx"
@@ -121,28 +248,39 @@ def get_summary(input_file_name):
         "Group By Endpoint": df_group_by_endpoint,
         "Group By Server": df_group_by_server,
     }
+    if not df_timeline.empty:
+        data_frames["Timeline"] = df_timeline
+    if not df_breakdown.empty:
+        data_frames["Breakdown"] = df_breakdown
     convert_data_frames_to_excel(data_frames, writer)
 
     # Close the Pandas Excel writer and output the Excel file.
     writer.close()
     input_file.close()
+    store_summary(df)
 
     print(f"Finish processing {filename_without_ext}")
     print(f"Output to {OUTPUT_FOLDER}/summary_{filename_without_ext}.xlsx")
 
-    return df
+    return df, df_timeline, df_breakdown
 
 
-def combine_summary(data_frames: List[pd.DataFrame]):
+def combine_summary(
+    data_frames: List[pd.DataFrame],
+    timeline_data_frames: List[pd.DataFrame],
+    breakdown_data_frames: List[pd.DataFrame],
+):
     print("Combine all summary")
     df = pd.concat(data_frames)
+    df_timeline = pd.concat(timeline_data_frames)
+    df_breakdown = pd.concat(breakdown_data_frames)
 
     df_group_by_concurrent = df.groupby(
-        ["server", "endpoint", "concurrent"], dropna=False
+        ["server", "endpoint", "concurrent", "scale"], dropna=False
+    ).mean(numeric_only=True)
+    df_group_by_endpoint = df.groupby(
+        ["server", "endpoint", "scale"], dropna=False
     ).mean(numeric_only=True)
-    df_group_by_endpoint = df.groupby(["server", "endpoint"], dropna=False).mean(
-        numeric_only=True
-    )
     df_group_by_server = df.groupby(["server"], dropna=False).mean(numeric_only=True)
 
     output_filename = f"{OUTPUT_FOLDER}/summary_all.xlsx"
@@ -155,6 +293,10 @@ def combine_summary(data_frames: List[pd.DataFrame]):
         "Group By Endpoint": df_group_by_endpoint,
         "Group By Server": df_group_by_server,
     }
+    if not df_timeline.empty:
+        dfs["Timeline"] = df_timeline
+    if not df_breakdown.empty:
+        dfs["Breakdown"] = df_breakdown
     convert_data_frames_to_excel(dfs, writer)
 
     print(f"Output to {output_filename}")
@@ -168,22 +310,33 @@ def main():
     args = sys.argv
     if len(args) < 2:
         print(
-            """Usage: python get_summary.py [<filename>|all]
-example: get_summary.py result_dafav1.txt
+            """Usage: python get_summary.py [<filename>|all] [warmup]
+<warmup> is the number of seconds at the start of each iteration excluded
+from the aggregate, only applied to result with timeline. Default 0
+example: get_summary.py result_dafav1.txt 5
 or 'python get_summary.py all' to get all summary"""
         )
         sys.exit(1)
 
+    warmup = 0
+    if len(args) > 2:
+        assert args[2].isdigit(), "Warmup must be a number of seconds"
+        warmup = int(args[2])
+
     data_frames: List[pd.DataFrame] = []
+    timeline_data_frames: List[pd.DataFrame] = []
+    breakdown_data_frames: List[pd.DataFrame] = []
     if args[1] == "all":
         for file in os.listdir(RESULT_FOLDER):
             full_path = os.path.join(RESULT_FOLDER, file)
-            df = get_summary(full_path)
+            df, df_timeline, df_breakdown = get_summary(full_path, warmup)
             data_frames.append(df)
+            timeline_data_frames.append(df_timeline)
+            breakdown_data_frames.append(df_breakdown)
 
-        combine_summary(data_frames)
+        combine_summary(data_frames, timeline_data_frames, breakdown_data_frames)
     else:
-        get_summary(args[1])
+        get_summary(args[1], warmup)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight metric recorder to be run on the tested machine.
+Sample cpu, memory, load, and optionally the rss of the tested service from /proc
+and write it to a ring buffer file that can be read by get_metric.py.
+Only use the standard library so it can run on a bare server.
+
+The ring buffer file has the following layout:
+<header><record 0><record 1>...<record capacity-1>
+When the file is full, the oldest record is overwritten.
+"""
+
+import os
+import struct
+import sys
+import time
+from typing import Dict, List, Optional
+
+THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+RECORDING_FOLDER = os.path.join(THIS_FOLDER, "recordings")
+
+DEFAULT_INTERVAL = 1.0
+# 48 hours of data at 1 second interval
+DEFAULT_CAPACITY = 172_800
+
+# Same mode name as the "cpu" metric in Digital Ocean API
+CPU_MODES = ["user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal"]
+
+# Name of each value in a record, the name follow the column generated by get_metric.py
+RECORD_FIELDS = (
+    ["epoch"]
+    + [f"cpu-{mode}" for mode in CPU_MODES]
+    + [
+        "memory_total",
+        "memory_free",
+        "memory_available",
+        "load_1",
+        "load_5",
+        "load_15",
+        "process_rss",
+    ]
+)
+# epoch and cpu time in seconds (double), memory in bytes (unsigned long long),
+# load average (float), rss in bytes (unsigned long long)
+RECORD_FORMAT = "<d" + "d" * len(CPU_MODES) + "QQQ" + "fff" + "Q"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+# magic, record size, capacity, number of record ever written
+HEADER_MAGIC = b"SRB1"
+HEADER_FORMAT = "<4sIIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_cpu_time() -> List[float]:
+    """read the total cpu time for each mode from /proc/stat
+
+    Returns:
+        List[float]: cpu time in seconds, ordered by CPU_MODES
+    """
+    with open("/proc/stat", "r") as stat_file:
+        values = stat_file.readline().split()[1 : len(CPU_MODES) + 1]
+
+    return [int(v) / CLOCK_TICKS for v in values]
+
+
+def read_memory() -> List[int]:
+    """read total, free, and available memory from /proc/meminfo
+
+    Returns:
+        List[int]: memory in bytes
+    """
+    memory: Dict[str, int] = {}
+    with open("/proc/meminfo", "r") as meminfo_file:
+        for line in meminfo_file:
+            key, value = line.split(":", 1)
+            if key in ("MemTotal", "MemFree", "MemAvailable"):
+                memory[key] = int(value.split()[0]) * 1024
+                if len(memory) == 3:
+                    break
+
+    return [memory["MemTotal"], memory["MemFree"], memory["MemAvailable"]]
+
+
+def read_load() -> List[float]:
+    """read 1, 5, and 15 minutes load average from /proc/loadavg"""
+    with open("/proc/loadavg", "r") as loadavg_file:
+        values = loadavg_file.read().split()[:3]
+
+    return [float(v) for v in values]
+
+
+def find_process_ids(process_name: str) -> List[int]:
+    """find all process id with the same name as process_name
+
+    Args:
+        process_name (str): name of the process as written in /proc/<pid>/comm
+
+    Returns:
+        List[int]: list of process id
+    """
+    process_ids = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/comm", "r") as comm_file:
+                if comm_file.read().strip() == process_name:
+                    process_ids.append(int(pid))
+        except OSError:
+            # Process already exited
+            continue
+
+    return process_ids
+
+
+def read_process_rss(process_ids: List[int]) -> Optional[int]:
+    """read the sum of the resident set size of all process
+
+    Args:
+        process_ids (List[int]): list of process id
+
+    Returns:
+        Optional[int]: rss in bytes, None if any of the process has exited
+    """
+    total = 0
+    for pid in process_ids:
+        try:
+            with open(f"/proc/{pid}/statm", "r") as statm_file:
+                total += int(statm_file.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            return None
+
+    return total
+
+
+class RingBufferWriter:
+    """Write fixed size record to a ring buffer file"""
+
+    def __init__(self, filename: str, capacity: int = DEFAULT_CAPACITY):
+        if os.path.exists(filename):
+            self.file = open(filename, "r+b")
+            magic, record_size, self.capacity, self.count = struct.unpack(
+                HEADER_FORMAT, self.file.read(HEADER_SIZE)
+            )
+            assert (
+                magic == HEADER_MAGIC and record_size == RECORD_SIZE
+            ), f"{filename} is not a recording file or has a different format"
+            print(f"Continue recording to {filename} ({self.count} records)")
+        else:
+            self.file = open(filename, "w+b")
+            self.capacity = capacity
+            self.count = 0
+            self.write_header()
+            self.file.truncate(HEADER_SIZE + RECORD_SIZE * capacity)
+            print(f"Recording to {filename}")
+
+    def write_header(self):
+        self.file.seek(0)
+        self.file.write(
+            struct.pack(
+                HEADER_FORMAT, HEADER_MAGIC, RECORD_SIZE, self.capacity, self.count
+            )
+        )
+
+    def write(self, values: list):
+        position = self.count % self.capacity
+        self.file.seek(HEADER_SIZE + position * RECORD_SIZE)
+        self.file.write(struct.pack(RECORD_FORMAT, *values))
+        # Only count the record after it is written, so a crash
+        # will never expose a half written record
+        self.count += 1
+        self.write_header()
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def record(filename: str, interval: float, process_name: Optional[str] = None):
+    """sample the metric every interval seconds until interrupted
+
+    Args:
+        filename (str): ring buffer file to write
+        interval (float): sampling interval in seconds
+        process_name (Optional[str], optional): name of the tested service. Defaults to None.
+    """
+    writer = RingBufferWriter(filename)
+    process_ids: List[int] = []
+    next_sample = time.monotonic()
+    try:
+        while True:
+            rss = 0
+            if process_name is not None:
+                process_rss = read_process_rss(process_ids) if process_ids else None
+                if process_rss is None:
+                    # The service is restarted or not started yet
+                    process_ids = find_process_ids(process_name)
+                    process_rss = read_process_rss(process_ids)
+                rss = process_rss or 0
+
+            writer.write(
+                [time.time(), *read_cpu_time(), *read_memory(), *read_load(), rss]
+            )
+
+            # Schedule from the monotonic clock so the interval does not drift
+            next_sample += interval
+            sleep_time = next_sample - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_sample = time.monotonic()
+    except KeyboardInterrupt:
+        print(f"Stop recording, {writer.count} records written")
+    finally:
+        writer.close()
+
+
+def main():
+    args = sys.argv
+    if len(args) < 2:
+        print(
+            """Usage: python record_metric.py <output_name> [interval] [process_name]
+    <interval> is the sampling interval in seconds, default 1
+    <process_name> is the name of the tested service to record the rss
+    the output is written to recordings/<output_name>.ring
+    example: record_metric.py dafav1 0.5 main"""
+        )
+        sys.exit(1)
+
+    interval = float(args[2]) if len(args) > 2 else DEFAULT_INTERVAL
+    assert interval > 0, "Interval must be greater than 0"
+    process_name = args[3] if len(args) > 3 else None
+
+    os.makedirs(RECORDING_FOLDER, exist_ok=True)
+    record(os.path.join(RECORDING_FOLDER, f"{args[1]}.ring"), interval, process_name)
+
+
+if __name__ == "__main__":
+    main()
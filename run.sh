@@ -1,6 +1,8 @@
 #!/bin/bash
 
 TYPE=$1
+# Optional scenario file, when provided only the scenario is tested
+SCENARIO=$2
 
 if [ "$TYPE" == "dafav1" ] || [ "$TYPE" == "dafav2" ] || [ "$TYPE" == "dafav3" ]; then
     HOST=10.104.0.2
@@ -15,7 +17,7 @@ elif [ "$TYPE" == "hanin" ]; then
     PORT=5000
     AUTH_METHOD=basic
 elif [ "$TYPE" == "" ]; then
-    echo "Missing parameter, usage ./run.sh [dafav1|dafav2|alvinv1|alvinv2|hanin]"
+    echo "Missing parameter, usage ./run.sh [dafav1|dafav2|alvinv1|alvinv2|hanin] [scenario_file]"
     exit 1
 else
     echo "Invalid parameter $TYPE, must be dafav1, dafav2, alvinv1, alvinv2, or hanin"
@@ -27,6 +29,9 @@ SLEEP_TIME=30
 TIMEOUT=600 # 10 minutes
 ITERATION=5
 CONCURENCY=(200 400 600 800 1000)
+# Number of rows compared to the sql dump, see generate_seed.py
+SCALES=(1)
+SCALE=1
 
 if [ "$TYPE" == "alvinv2" ] || [ "$TYPE" == "dafav2" ] || [ "$TYPE" == "dafav3" ]; then
     USERNAME="admin"
@@ -43,16 +48,32 @@ echo "Sleep time: $SLEEP_TIME"
 echo "Timeout: $TIMEOUT"
 echo "Iteration: $ITERATION"
 echo "Concurency:" "${CONCURENCY[@]}"
+echo "Scales:" "${SCALES[@]}"
 echo "Auth method: $AUTH_METHOD"
 echo "Username: $USERNAME"
 echo "Password: $PASSWORD"
+echo "Scenario: $SCENARIO"
 
 init_db() {
     if [ "$TYPE" == "alvinv2" ] || [ "$TYPE" == "dafav2" ] || [ "$TYPE" == "dafav3" ]; then
-        PGPASSWORD=postgres psql -h $HOST -U postgres postgres <version2.sql
+        local version=version2
     else
-        PGPASSWORD=postgres psql -h $HOST -U postgres postgres <version1.sql
+        local version=version1
     fi
+
+    local seed_file=$version.sql
+    if [ "$SCALE" != "1" ]; then
+        # Generate the scaled dump once and reuse it on every rollback
+        seed_file=seed/${version}_${SCALE}.sql
+        if [ ! -f "$seed_file" ]; then
+            mkdir -p seed
+            python3 generate_seed.py $version $SCALE >"$seed_file.tmp" && mv "$seed_file.tmp" "$seed_file"
+        fi
+    fi
+
+    PGPASSWORD=postgres psql -h $HOST -U postgres postgres <"$seed_file"
+    # Update the planner statistics after the bulk load, before the next iteration
+    PGPASSWORD=postgres psql -h $HOST -U postgres postgres -c "ANALYZE;"
 }
 
 drop_table_db() {
@@ -93,6 +114,13 @@ test_connection() {
     fi
 }
 
+# Run siege in verbose mode and pipe it to timeline.py to get per second timeline
+# Return the exit code of siege instead of timeline.py
+run_siege() {
+    timeout --signal=SIGKILL $TIMEOUT siege -v "$@" 2>&1 | python3 timeline.py
+    return ${PIPESTATUS[0]}
+}
+
 perftest() {
     local method=$1
     local endpoint=$2
@@ -108,12 +136,12 @@ perftest() {
             while true; do
                 if [ $method == "GET" ] || [ $method == "DELETE" ]; then
                     if [ $TYPE == "dafav3" ]; then
-                        timeout --signal=SIGKILL $TIMEOUT siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint" --header="$HEADER" --header="Accept:text/html"
+                        run_siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint" --header="$HEADER" --header="Accept:text/html"
                     else
-                        timeout --signal=SIGKILL $TIMEOUT siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint" --header="$HEADER"
+                        run_siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint" --header="$HEADER"
                     fi
                 elif [ $method == "PUT" ] || [ $method == "POST" ]; then
-                    timeout --signal=SIGKILL $TIMEOUT siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint $method $data" --header="$HEADER" --content-type "application/json"
+                    run_siege -t$TEST_TIME -c$concurrent "$HOST:$PORT$endpoint $method $data" --header="$HEADER" --content-type "application/json"
                 fi
 
                 if [[ $? -eq 137 ]]; then # If Timeout restart the loop
@@ -137,6 +165,49 @@ perftest() {
     done
 }
 
+## perftest_scenario SCENARIO_FILE
+# Run a weighted mix of request defined in the scenario file, see scenario.py
+perftest_scenario() {
+    local scenario_file=$1
+    # Same as the scenario name in scenario.py
+    local name=$(basename "$scenario_file" .json)
+    for concurrent in "${CONCURENCY[@]}"; do
+        echo "$(TZ=UTC-7 date -R) ($(date +%s))"
+        # One argument per line so path with space is kept as one argument
+        local scenario_output
+        scenario_output=$(python3 scenario.py "$scenario_file" $TYPE $HOST:$PORT $concurrent) || {
+            echo "Invalid scenario $scenario_file"
+            exit 1
+        }
+        local siege_args
+        mapfile -t siege_args <<<"$scenario_output"
+        if [ $TYPE == "dafav3" ]; then
+            siege_args+=(--header="Accept:text/html")
+        fi
+        for i in $(seq 1 $ITERATION); do
+            echo "$(TZ=UTC-7 date -R) ($(date +%s))"
+            echo "[ SCENARIO $name $concurrent][$i]"
+
+            while true; do
+                run_siege -t$TEST_TIME -c$concurrent "${siege_args[@]}" --header="$HEADER" --content-type "application/json"
+
+                if [[ $? -eq 137 ]]; then # If Timeout restart the loop
+                    echo "Timeout hit, restarting... $(TZ=UTC-7 date -R) ($(date +%s))"
+                    continue
+                else
+                    break
+                fi
+            done
+            ssh -i ~/iot_test_server root@$HOST sudo systemctl restart postgresql
+
+            echo "Sleeping $SLEEP_TIME seconds..."
+            sleep $SLEEP_TIME
+            # Scenario may contain write request, always rollback
+            rollback_db >/dev/null
+        done
+    done
+}
+
 auth() {
     if [ $AUTH_METHOD == "jwt" ]; then
         if [ "$TYPE" == "alvinv2" ] || [ "$TYPE" == "alvinv1" ]; then
@@ -153,6 +224,15 @@ auth() {
 rollback_db
 auth
 
+if [ "$SCENARIO" != "" ]; then
+    for SCALE in "${SCALES[@]}"; do
+        echo "Scale: $SCALE"
+        rollback_db >/dev/null
+        perftest_scenario "$SCENARIO"
+    done
+    exit 0
+fi
+
 echo "Testing connection..."
 if [ $TYPE == "dafav3" ]; then
     perftest "GET" "/node" "" false
@@ -182,28 +262,33 @@ fi
 echo "Connection test success"
 
 ## perftest METHOD ENDPOINT DATA DO_ROLLBACK
-if [ $TYPE == "dafav3" ]; then
-    perftest "GET" "/node" "" false
-    perftest "GET" "/node/1" "" false
-else
-    perftest "GET" "/node" "" false
-    perftest "GET" "/node/1" "" false
-fi
+# Run every endpoint for each data size
+for SCALE in "${SCALES[@]}"; do
+    echo "Scale: $SCALE"
+    rollback_db >/dev/null
+    if [ $TYPE == "dafav3" ]; then
+        perftest "GET" "/node" "" false
+        perftest "GET" "/node/1" "" false
+    else
+        perftest "GET" "/node" "" false
+        perftest "GET" "/node/1" "" false
+    fi
 
-if [ "$TYPE" == "alvinv2" ] || [ "$TYPE" == "dafav2" ]; then
-    if [ "$TYPE" == "alvinv2" ]; then
-        perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : \"{3,4,4,17,8,7,3,4,5,7}\", \"field_sensor\": \"{\\\"test\\\",\\\"asd\\\",\\\"sensor3\\\",\\\"sensor4\\\",\\\"sensor5\\\",\\\"sensor6\\\",\\\"sensor7\\\",\\\"sensor8\\\",\\\"sensor9\\\",\\\"sensor10\\\"}\"}" true
-        perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : \"{3,4,4,17,8,7,3,4,5,7}\", \"field_sensor\": \"{\\\"test\\\",\\\"asd\\\",\\\"sensor3\\\",\\\"sensor4\\\",\\\"sensor5\\\",\\\"sensor6\\\",\\\"sensor7\\\",\\\"sensor8\\\",\\\"sensor9\\\",\\\"sensor10\\\"}\"}" true
-        perftest "POST" "/channel" "{\"value\": \"{3.21,3.14,8.39,9.12,3.94,13.23,183.2,192.3,72.3,93.2}\", \"id_node\": 1}" true
+    if [ "$TYPE" == "alvinv2" ] || [ "$TYPE" == "dafav2" ]; then
+        if [ "$TYPE" == "alvinv2" ]; then
+            perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : \"{3,4,4,17,8,7,3,4,5,7}\", \"field_sensor\": \"{\\\"test\\\",\\\"asd\\\",\\\"sensor3\\\",\\\"sensor4\\\",\\\"sensor5\\\",\\\"sensor6\\\",\\\"sensor7\\\",\\\"sensor8\\\",\\\"sensor9\\\",\\\"sensor10\\\"}\"}" true
+            perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : \"{3,4,4,17,8,7,3,4,5,7}\", \"field_sensor\": \"{\\\"test\\\",\\\"asd\\\",\\\"sensor3\\\",\\\"sensor4\\\",\\\"sensor5\\\",\\\"sensor6\\\",\\\"sensor7\\\",\\\"sensor8\\\",\\\"sensor9\\\",\\\"sensor10\\\"}\"}" true
+            perftest "POST" "/channel" "{\"value\": \"{3.21,3.14,8.39,9.12,3.94,13.23,183.2,192.3,72.3,93.2}\", \"id_node\": 1}" true
+        else
+            perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : [3, 4, 4, 17, 8, 7, 3,  4 , 5 ,7], \"field_sensor\": [\"test\", \"asd\", \"sensor3\",\"sensor4\", \"sensor5\", \"sensor6\", \"sensor7\", \"sensor8\", \"sensor9\", \"sensor10\"] }" true
+            perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : [3, 4, 4, 17, 8, 7, 3,  4 , 5 ,7], \"field_sensor\": [\"test\", \"asd\", \"sensor3\",\"sensor4\", \"sensor5\", \"sensor6\", \"sensor7\", \"sensor8\", \"sensor9\", \"sensor10\"] }" true
+            perftest "POST" "/channel" "{\"value\": [3.21, 3.14, 8.39, 9.12, 3.94, 13.23, 183.2, 192.3, 72.3, 93.2], \"id_node\": 1}" true
+        fi
     else
-        perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : [3, 4, 4, 17, 8, 7, 3,  4 , 5 ,7], \"field_sensor\": [\"test\", \"asd\", \"sensor3\",\"sensor4\", \"sensor5\", \"sensor6\", \"sensor7\", \"sensor8\", \"sensor9\", \"sensor10\"] }" true
-        perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware_node\":1, \"id_hardware_sensor\" : [3, 4, 4, 17, 8, 7, 3,  4 , 5 ,7], \"field_sensor\": [\"test\", \"asd\", \"sensor3\",\"sensor4\", \"sensor5\", \"sensor6\", \"sensor7\", \"sensor8\", \"sensor9\", \"sensor10\"] }" true
-        perftest "POST" "/channel" "{\"value\": [3.21, 3.14, 8.39, 9.12, 3.94, 13.23, 183.2, 192.3, 72.3, 93.2], \"id_node\": 1}" true
+        perftest "GET" "/sensor" "" false
+        perftest "GET" "/sensor/1" "" false
+        perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware\":1 }" true
+        perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware\":1 }" true
+        perftest "POST" "/channel" "{\"value\": 1.33, \"id_sensor\": 1}" true
     fi
-else
-    perftest "GET" "/sensor" "" false
-    perftest "GET" "/sensor/1" "" false
-    perftest "PUT" "/node/1" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware\":1 }" true
-    perftest "POST" "/node" "{ \"name\":\"test\",\"location\":\"test\",\"id_hardware\":1 }" true
-    perftest "POST" "/channel" "{\"value\": 1.33, \"id_sensor\": 1}" true
-fi
+done
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Script to convert a scenario file into siege arguments.
+A scenario is a JSON file in the scenario folder with the following format:
+{
+    "think_time": <mean think time of each user in seconds>,
+    "arrival_rate": <optional, upper bound of request per second, replace think_time>,
+    "requests": [
+        {"method": "GET", "path": "/node", "weight": 20},
+        {"method": "POST", "path": "/channel", "data": "<payload name>", "weight": 60}
+    ]
+}
+The scenario name is the file name without extension, it is used for the url file
+and the SCENARIO <name> endpoint written by run.sh.
+The weighted request mix is written as a siege url file where each request is
+repeated according to its weight, siege pick a random line for every request (-i).
+The siege arguments are printed one per line.
+
+Limitation: every simulated user reuse the same JWT session obtained when run.sh
+login, there is no login per user. Each request is picked independently at random,
+so a user does not follow a request sequence, only the overall mix is simulated.
+siege is a closed loop, arrival_rate is converted to a think time that ignore the
+response time, so the real rate is concurrent / (think time + response time)
+and always below arrival_rate, the gap grows with the load.
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict
+
+THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+SCENARIO_FOLDER = os.path.join(THIS_FOLDER, "scenario")
+
+METHODS = ["GET", "POST", "PUT", "DELETE"]
+
+# Number of line in the url file, the weight is scaled to this number
+URL_FILE_LINES = 100
+
+NODE_PAYLOAD_V2 = {
+    "name": "test",
+    "location": "test",
+    "id_hardware_node": 1,
+    "id_hardware_sensor": [3, 4, 4, 17, 8, 7, 3, 4, 5, 7],
+    "field_sensor": [
+        "test",
+        "asd",
+        "sensor3",
+        "sensor4",
+        "sensor5",
+        "sensor6",
+        "sensor7",
+        "sensor8",
+        "sensor9",
+        "sensor10",
+    ],
+}
+CHANNEL_VALUE_V2 = [3.21, 3.14, 8.39, 9.12, 3.94, 13.23, 183.2, 192.3, 72.3, 93.2]
+
+# Same payload as the one used in run.sh for each server type
+PAYLOAD: Dict[str, Dict[str, dict]] = {
+    "v1": {
+        "node": {"name": "test", "location": "test", "id_hardware": 1},
+        "channel": {"value": 1.33, "id_sensor": 1},
+    },
+    "v2": {
+        "node": NODE_PAYLOAD_V2,
+        "channel": {"value": CHANNEL_VALUE_V2, "id_node": 1},
+    },
+    # alvinv2 receive array as postgres array literal
+    "alvinv2": {
+        "node": {
+            **NODE_PAYLOAD_V2,
+            "id_hardware_sensor": "{3,4,4,17,8,7,3,4,5,7}",
+            "field_sensor": "{"
+            + ",".join(f'"{f}"' for f in NODE_PAYLOAD_V2["field_sensor"])
+            + "}",
+        },
+        "channel": {
+            "value": "{" + ",".join(str(v) for v in CHANNEL_VALUE_V2) + "}",
+            "id_node": 1,
+        },
+    },
+}
+
+
+def get_payload_version(server_type: str) -> str:
+    if server_type == "alvinv2":
+        return "alvinv2"
+    elif server_type in ("dafav2", "dafav3"):
+        return "v2"
+
+    return "v1"
+
+
+def load_scenario(scenario_file_name) -> dict:
+    """read and validate the scenario file
+
+    Args:
+        scenario_file_name (str): path to the scenario JSON file
+
+    Returns:
+        dict: the scenario
+    """
+    with open(scenario_file_name, "r") as scenario_file:
+        scenario = json.load(scenario_file)
+
+    scenario["name"] = Path(scenario_file_name).stem
+    assert " " not in scenario["name"], "Scenario file name must not contain space"
+    assert len(scenario.get("requests", [])) > 0, "Scenario must have requests"
+    for request in scenario["requests"]:
+        method = request["method"]
+        assert method in METHODS, f"Invalid method {method}"
+        assert request["weight"] > 0, "Weight must be greater than 0"
+
+    return scenario
+
+
+def create_url_file(scenario: dict, server_type: str, host: str) -> str:
+    """write the weighted request mix as a siege url file
+
+    Args:
+        scenario (dict): the scenario
+        server_type (str): type of the server as in run.sh, used to pick the payload
+        host (str): host and port of the server
+
+    Returns:
+        str: path to the url file
+    """
+    payload = PAYLOAD[get_payload_version(server_type)]
+    total_weight = sum(request["weight"] for request in scenario["requests"])
+    url_file_name = os.path.join(SCENARIO_FOLDER, f"{scenario['name']}.urls")
+
+    with open(url_file_name, "w") as url_file:
+        for request in scenario["requests"]:
+            line = f"http://{host}{request['path']}"
+            if request["method"] != "GET":
+                line += f" {request['method']}"
+            if "data" in request:
+                line += f" {json.dumps(payload[request['data']])}"
+
+            repeat = max(1, round(request["weight"] / total_weight * URL_FILE_LINES))
+            for _ in range(repeat):
+                url_file.write(line + "\n")
+
+    return url_file_name
+
+
+def get_delay(scenario: dict, concurrent: int) -> float:
+    """get the siege delay, siege wait a random time between 0 and delay
+    before each request, so the mean think time is half of the delay.
+    arrival_rate is only an approximate upper bound, the response time is
+    added to the think time so the real rate is lower
+
+    Args:
+        scenario (dict): the scenario
+        concurrent (int): number of simulated user
+
+    Returns:
+        float: siege delay in seconds
+    """
+    if scenario.get("arrival_rate"):
+        # Each user send at most one request every concurrent / arrival_rate seconds
+        think_time = concurrent / scenario["arrival_rate"]
+    else:
+        think_time = scenario.get("think_time", 0)
+
+    return round(think_time * 2, 3)
+
+
+def main():
+    args = sys.argv
+    if len(args) < 5:
+        print(
+            """Usage: python scenario.py <scenario_file> <type> <host:port> <concurrent>
+    print the siege arguments to run the scenario, one argument per line
+    example: scenario.py scenario/sensor_dashboard.json dafav2 10.104.0.2:3000 200"""
+        )
+        sys.exit(1)
+
+    assert args[4].isdigit(), "Concurrent must be a number"
+
+    scenario = load_scenario(args[1])
+    url_file_name = create_url_file(scenario, args[2], args[3])
+    delay = get_delay(scenario, int(args[4]))
+    print("-i")
+    print(f"--file={url_file_name}")
+    print(f"--delay={delay}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+"""
+Build a per second timeline from siege verbose output.
+siege output is piped to this script, every transaction line and the text summary
+are consumed and the other lines are written to stdout unchanged.
+siege json_output disable the verbose output, so it must be off and the text summary
+is converted to the same json summary printed by siege with json_output.
+When siege finish, the json summary is written to stdout followed by the timeline:
+TIMELINE,<second>,<transactions>,<http_errors>,<failed>,<response_time>,<latency_p50>,<latency_p90>,<latency_p99>,<longest_transaction>,<shortest_transaction>,<bytes>
+and the breakdown per request type, used for scenario with mixed requests:
+BREAKDOWN,<request>,<transactions>,<http_errors>,<failed>,<response_time>,<latency_p50>,<latency_p90>,<latency_p99>,<longest_transaction>,<shortest_transaction>,<bytes>
+Like siege, transactions count every response including HTTP error (status >= 400),
+failed count the request without response.
+"""
+
+import json
+import math
+import re
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+TIMELINE_PREFIX = "TIMELINE,"
+TIMELINE_COLUMNS = [
+    "second",
+    "transactions",
+    "http_errors",
+    "failed",
+    "response_time",
+    "latency_p50",
+    "latency_p90",
+    "latency_p99",
+    "longest_transaction",
+    "shortest_transaction",
+    "bytes",
+]
+
+# Example: HTTP/1.1 200     0.02 secs:     524 bytes ==> GET  /node/1
+TRANSACTION_PATTERN = re.compile(
+    r"HTTP/\S+\s+(\d{3})\s+([\d.]+)\s+secs:\s+(\d+)\s+bytes\s+==>\s+(\w+)\s+(\S+)"
+)
+BREAKDOWN_PREFIX = "BREAKDOWN,"
+BREAKDOWN_COLUMNS = [
+    "request",
+    "transactions",
+    "http_errors",
+    "failed",
+    "response_time",
+    "latency_p50",
+    "latency_p90",
+    "latency_p99",
+    "longest_transaction",
+    "shortest_transaction",
+    "bytes",
+]
+
+# Key of the json summary, the text summary label is the key in title case
+SUMMARY_COLUMNS = [
+    "transactions",
+    "availability",
+    "elapsed_time",
+    "data_transferred",
+    "response_time",
+    "transaction_rate",
+    "throughput",
+    "concurrency",
+    "successful_transactions",
+    "failed_transactions",
+    "longest_transaction",
+    "shortest_transaction",
+]
+SUMMARY_COUNT_COLUMNS = [
+    "transactions",
+    "successful_transactions",
+    "failed_transactions",
+]
+# Example: Response time:		        0.13 secs
+SUMMARY_PATTERN = re.compile(r"^([A-Z][a-z ]+):\s*([\d.]+)\s*(\S*)")
+
+ERROR_PREFIX = "[error]"
+# siege print the full url for some method, only keep the path
+URL_HOST_PATTERN = re.compile(r"^https?://[^/]+")
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def quantile(sorted_values, q: float) -> float:
+    """get the q quantile of a sorted values using the nearest rank method"""
+    if len(sorted_values) == 0:
+        return 0.0
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Transactions:
+    """Transactions completed in one second or for one request type"""
+
+    def __init__(self):
+        self.http_errors = 0
+        self.failed = 0
+        self.bytes = 0
+        self.latencies = array("d")
+
+    def add_response(self, status: int, latency: float, size: int):
+        if status >= 400:
+            self.http_errors += 1
+        self.bytes += size
+        self.latencies.append(latency)
+
+    def to_row(self, key) -> list:
+        latencies = sorted(self.latencies)
+        response_time = sum(latencies) / len(latencies) if latencies else 0.0
+        return [
+            key,
+            len(latencies),
+            self.http_errors,
+            self.failed,
+            round(response_time, 4),
+            quantile(latencies, 0.5),
+            quantile(latencies, 0.9),
+            quantile(latencies, 0.99),
+            latencies[-1] if latencies else 0.0,
+            latencies[0] if latencies else 0.0,
+            self.bytes,
+        ]
+
+
+def parse_summary_line(line: str) -> Optional[Tuple[str, float]]:
+    """parse one line of the siege text summary
+
+    Args:
+        line (str): line without the ANSI escape code
+
+    Returns:
+        Optional[Tuple[str, float]]: json summary key and the value,
+        None when the line is not part of the summary
+    """
+    match = SUMMARY_PATTERN.match(line)
+    if match is None:
+        return None
+
+    key = match.group(1).strip().lower().replace(" ", "_")
+    if key not in SUMMARY_COLUMNS:
+        return None
+
+    value = float(match.group(2))
+    if match.group(3) == "ms":
+        value /= 1000
+    return key, value
+
+
+def build_timeline(
+    input_stream, output_stream
+) -> Tuple[Dict[int, Transactions], Dict[str, Transactions], Dict[str, float]]:
+    """consume siege output and group the transaction per second since start
+    and per request type
+
+    Args:
+        input_stream: siege output
+        output_stream: where to write the non transaction line
+
+    Returns:
+        Tuple[Dict[int, Transactions], Dict[str, Transactions], Dict[str, float]]:
+        transactions grouped by second and by request type, and the siege summary
+    """
+    start = time.monotonic()
+    seconds: Dict[int, Transactions] = {}
+    requests: Dict[str, Transactions] = {}
+    summary: Dict[str, float] = {}
+    for line in input_stream:
+        second = int(time.monotonic() - start)
+        clean_line = ANSI_ESCAPE_PATTERN.sub("", line).strip()
+
+        summary_value = parse_summary_line(clean_line)
+        if summary_value is not None:
+            summary[summary_value[0]] = summary_value[1]
+            continue
+
+        match = TRANSACTION_PATTERN.search(clean_line)
+        if match is None and not clean_line.startswith(ERROR_PREFIX):
+            output_stream.write(line)
+            output_stream.flush()
+            continue
+
+        if second not in seconds:
+            seconds[second] = Transactions()
+
+        if match is None:
+            # Socket error, no response received, the request type is unknown
+            seconds[second].failed += 1
+            continue
+
+        path = URL_HOST_PATTERN.sub("", match.group(5))
+        request = f"{match.group(4)} {path}"
+        if request not in requests:
+            requests[request] = Transactions()
+
+        for transactions in (seconds[second], requests[request]):
+            transactions.add_response(
+                int(match.group(1)), float(match.group(2)), int(match.group(3))
+            )
+
+    return seconds, requests, summary
+
+
+def format_summary(summary: Dict[str, float]) -> List[str]:
+    """format the text summary as the siege json summary,
+    nothing is written when siege is killed before printing the summary
+
+    Args:
+        summary (Dict[str, float]): summary parsed from the text summary
+
+    Returns:
+        List[str]: lines of the json summary
+    """
+    if any(column not in summary for column in SUMMARY_COLUMNS):
+        return []
+
+    json_summary = {
+        column: int(summary[column])
+        if column in SUMMARY_COUNT_COLUMNS
+        else summary[column]
+        for column in SUMMARY_COLUMNS
+    }
+    return json.dumps(json_summary, indent="\t").splitlines()
+
+
+def format_timeline(seconds: Dict[int, Transactions]) -> List[str]:
+    """format the timeline, second without any transaction is written as zero"""
+    lines = []
+    last_second = max(seconds) if seconds else -1
+    for second in range(last_second + 1):
+        row = seconds.get(second, Transactions()).to_row(second)
+        lines.append(TIMELINE_PREFIX + ",".join(str(v) for v in row))
+
+    return lines
+
+
+def format_breakdown(requests: Dict[str, Transactions]) -> List[str]:
+    """format the breakdown per request type"""
+    lines = []
+    for request in sorted(requests):
+        row = requests[request].to_row(request)
+        lines.append(BREAKDOWN_PREFIX + ",".join(str(v) for v in row))
+
+    return lines
+
+
+def main():
+    if len(sys.argv) > 1:
+        print(
+            """Usage: siege -v ... 2>&1 | python timeline.py
+    siege must be run in verbose mode with json_output = false so each transaction
+    and the text summary are printed"""
+        )
+        sys.exit(1)
+
+    seconds, requests, summary = build_timeline(sys.stdin, sys.stdout)
+    lines = format_summary(summary) + format_timeline(seconds)
+    for line in lines + format_breakdown(requests):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Historical result warehouse, every summary generated by get_summary.py and
+every metric read by get_metric.py is appended to a SQLite database so
+results from different runs can be compared without loading each xlsx file.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+from typing import Dict, List
+
+import pandas as pd
+
+THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+WAREHOUSE_FILE = os.path.join(THIS_FOLDER, "warehouse.sqlite")
+
+# Column of the siege json output
+SIEGE_COLUMNS = [
+    "transactions",
+    "availability",
+    "elapsed_time",
+    "data_transferred",
+    "response_time",
+    "transaction_rate",
+    "throughput",
+    "concurrency",
+    "successful_transactions",
+    "failed_transactions",
+    "longest_transaction",
+    "shortest_transaction",
+]
+RESULT_COLUMNS = [
+    "server",
+    "version",
+    "endpoint",
+    "concurrent",
+    "iteration",
+    "scale",
+    "warmup",
+    "epoch",
+    "time",
+    *SIEGE_COLUMNS,
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS siege_result (
+    server TEXT NOT NULL,
+    version TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    concurrent INTEGER NOT NULL,
+    iteration INTEGER NOT NULL,
+    scale REAL NOT NULL DEFAULT 1,
+    warmup INTEGER NOT NULL DEFAULT 0,
+    epoch INTEGER NOT NULL,
+    time TEXT,
+    {", ".join(f"{column} REAL" for column in SIEGE_COLUMNS)},
+    UNIQUE (server, endpoint, concurrent, scale, warmup, iteration, epoch)
+);
+CREATE INDEX IF NOT EXISTS siege_result_run_index
+    ON siege_result (server, version, endpoint, concurrent, epoch);
+CREATE INDEX IF NOT EXISTS siege_result_endpoint_index
+    ON siege_result (endpoint, transaction_rate);
+CREATE TABLE IF NOT EXISTS metric (
+    server TEXT NOT NULL,
+    version TEXT NOT NULL,
+    epoch REAL NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    UNIQUE (server, epoch, name)
+);
+CREATE INDEX IF NOT EXISTS metric_run_index ON metric (server, version, epoch);
+"""
+
+NAMED_QUERIES: Dict[str, str] = {
+    # SQLite return the other column from the row with the max value
+    "peak": """
+        SELECT endpoint, scale, warmup, server, version, concurrent,
+            MAX(transaction_rate) AS transaction_rate
+        FROM siege_result
+        GROUP BY endpoint, scale, warmup
+        ORDER BY endpoint, scale, warmup
+    """,
+    "runs": """
+        SELECT server, version, scale, warmup, COUNT(*) AS iterations,
+            MIN(epoch) AS start, MAX(epoch) AS end
+        FROM siege_result
+        GROUP BY server, scale, warmup
+        ORDER BY start, scale, warmup
+    """,
+}
+
+
+def get_server_version(server_name: str) -> str:
+    """get the api version from the server name, dafav1_optimized is v1,
+    server without version such as hanin use version1.sql so it is v1
+
+    Args:
+        server_name (str): name of the server
+
+    Returns:
+        str: version of the server
+    """
+    match = re.search(r"v(\d+)", server_name)
+    if match is None:
+        return "v1"
+    return f"v{match.group(1)}"
+
+
+def connect(warehouse_file: str = WAREHOUSE_FILE) -> sqlite3.Connection:
+    connection = sqlite3.connect(warehouse_file)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def store_summary(df: pd.DataFrame, warehouse_file: str = WAREHOUSE_FILE):
+    """append the siege result to the warehouse, the same iteration is replaced
+
+    Args:
+        df (pd.DataFrame): "All" dataframe generated by get_summary.py
+        warehouse_file (str, optional): path to the warehouse. Defaults to WAREHOUSE_FILE.
+    """
+    df = df.copy()
+    df["version"] = df["server"].map(get_server_version)
+    if "scale" not in df:
+        df["scale"] = 1.0
+    if "warmup" not in df:
+        df["warmup"] = 0
+    df["concurrent"] = df["concurrent"].astype(int)
+    df["epoch"] = df["epoch"].astype(int)
+    df = df.reindex(columns=RESULT_COLUMNS)
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+
+    connection = connect(warehouse_file)
+    with connection:
+        connection.executemany(
+            f"""INSERT OR REPLACE INTO siege_result ({", ".join(RESULT_COLUMNS)})
+            VALUES ({", ".join("?" for _ in RESULT_COLUMNS)})""",
+            rows,
+        )
+    connection.close()
+    print(f"Stored {len(rows)} results to {warehouse_file}")
+
+
+def store_metric(df: pd.DataFrame, warehouse_file: str = WAREHOUSE_FILE):
+    """append the metric to the warehouse, the same sample is replaced
+
+    Args:
+        df (pd.DataFrame): dataframe generated by get_metric.py
+        warehouse_file (str, optional): path to the warehouse. Defaults to WAREHOUSE_FILE.
+    """
+    if df.empty:
+        return
+
+    df_long = df.drop(columns=["time"], errors="ignore").melt(
+        id_vars=["server", "epoch"], var_name="name", value_name="value"
+    )
+    df_long = df_long.dropna(subset=["value"])
+    df_long["version"] = df_long["server"].map(get_server_version)
+    rows = df_long[["server", "version", "epoch", "name", "value"]].values.tolist()
+
+    connection = connect(warehouse_file)
+    with connection:
+        connection.executemany(
+            """INSERT OR REPLACE INTO metric (server, version, epoch, name, value)
+            VALUES (?, ?, ?, ?, ?)""",
+            rows,
+        )
+    connection.close()
+    print(f"Stored {len(rows)} metric values to {warehouse_file}")
+
+
+def query(sql: str, params: tuple = (), warehouse_file: str = WAREHOUSE_FILE):
+    connection = connect(warehouse_file)
+    df = pd.read_sql_query(sql, connection, params=params)
+    connection.close()
+    return df
+
+
+def load_summary(
+    servers: List[str], warmup: int = 0, warehouse_file: str = WAREHOUSE_FILE
+) -> pd.DataFrame:
+    """load the siege result of the servers with the same format as the "All" sheet,
+    only the result with the same warmup is loaded so trimmed and untrimmed result
+    are never mixed"""
+    placeholders = ", ".join("?" for _ in servers)
+    return query(
+        f"""SELECT * FROM siege_result
+        WHERE server IN ({placeholders}) AND warmup = ?
+        ORDER BY server, epoch""",
+        (*servers, warmup),
+        warehouse_file,
+    )
+
+
+def load_metric(
+    servers: List[str], warehouse_file: str = WAREHOUSE_FILE
+) -> pd.DataFrame:
+    """load the metric of the servers with the same format as get_metric.py"""
+    placeholders = ", ".join("?" for _ in servers)
+    df_long = query(
+        f"""SELECT server, epoch, name, value FROM metric
+        WHERE server IN ({placeholders})""",
+        tuple(servers),
+        warehouse_file,
+    )
+    df = df_long.pivot_table(
+        index=["server", "epoch"], columns="name", values="value"
+    ).reset_index()
+    df.columns.name = None
+    return df
+
+
+def import_summary_file(summary_file_name: str):
+    """store an existing summary xlsx file generated by get_summary.py"""
+    print(f"Importing {summary_file_name}")
+    df = pd.read_excel(summary_file_name, sheet_name="All")
+    store_summary(df)
+
+
+def main():
+    args = sys.argv
+    if len(args) < 2:
+        print(
+            f"""Usage: python warehouse.py [{"|".join(NAMED_QUERIES)}|query <sql>|import <summary_file>...]
+    example: warehouse.py peak
+    or warehouse.py query "SELECT server, AVG(transaction_rate) FROM siege_result GROUP BY server"
+    or warehouse.py import summary/summary_dafav1.xlsx"""
+        )
+        sys.exit(1)
+
+    pd.set_option("display.max_rows", None)
+    pd.set_option("display.width", None)
+    if args[1] in NAMED_QUERIES:
+        print(query(NAMED_QUERIES[args[1]]).to_string(index=False))
+    elif args[1] == "query":
+        assert len(args) > 2, "Missing sql query"
+        print(query(args[2]).to_string(index=False))
+    elif args[1] == "import":
+        for summary_file_name in args[2:]:
+            import_summary_file(summary_file_name)
+    else:
+        print(f"Unknown command {args[1]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()